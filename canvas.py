@@ -5,12 +5,21 @@ import threading
 import time
 from time import perf_counter_ns
 import math
-import glob
 import os
 import ilda
+import playlist
+import library
+import transform
 
 SERIAL_TIMEOUT = 1
 
+SORT_KEYS = {
+    "Name": 'path',
+    "Frames": 'frames',
+    "Avg Points": 'avg_points',
+    "Max Points": 'max_points'
+}
+
 def wait_us(delay):
     target = perf_counter_ns() + delay * 1000
     while perf_counter_ns() < target:
@@ -27,6 +36,7 @@ class Canvas(tk.Frame):
 
         self.size = size
         self.scale = 1
+        self.transform = transform.Transform(scale=self.scale)
 
         self.speed = 0
         self.play_speed = 0
@@ -39,8 +49,22 @@ class Canvas(tk.Frame):
         self.start = 0
 
         self.files = [[],[]]
+        self.thumbnails = []
+
+        self.library = library.Library(os.path.dirname(__file__))
+        self.sort = 'path'
+        self.max_points = None
 
         self.data = None
+        self.store = None
+        self.playlist = None
+
+        self.fanout = None
+
+        # resample frames to a fixed number of points, played at a fixed point rate
+        self.points = None
+        self.point_period = 0
+        self.next_point = 0
 
         #-------------------------------------------------- menu --------------------------------------------------#
         self.menu = tk.Frame(self)
@@ -91,6 +115,38 @@ class Canvas(tk.Frame):
         self.scale_slider.set(self.scale * 100)
         self.scale_slider.grid(row=0, column=7, sticky='EW')
 
+        #-------------------------------------------------- library --------------------------------------------------#
+        self.library_menu = tk.Frame(self.menu)
+        self.library_menu.grid(row=1, column=0, columnspan=9, pady=(4,0), sticky='EW')
+
+        # sort menu
+        self.sort_label = tk.Label(self.library_menu, text='Sort')
+        self.sort_label.grid(row=0, column=0, padx=(4,0), sticky="W")
+
+        self.sort_cbox = ttk.Combobox(self.library_menu, state='readonly', values=list(SORT_KEYS), width=10)
+        self.sort_cbox.current(0)
+        self.sort_cbox.grid(row=0, column=1, padx=4)
+
+        self.sort_cbox.bind('<<ComboboxSelected>>', self.set_sort)
+
+        # max points entry
+        self.max_points_label = tk.Label(self.library_menu, text='Max Points')
+        self.max_points_label.grid(row=0, column=2, sticky="W")
+
+        self.max_points_entry = tk.Entry(self.library_menu, width=6)
+        self.max_points_entry.grid(row=0, column=3, padx=4)
+
+        self.max_points_entry.bind('<Return>', self.set_max_points)
+
+        # points per frame entry
+        self.points_label = tk.Label(self.library_menu, text='Points')
+        self.points_label.grid(row=0, column=4, sticky="W")
+
+        self.points_entry = tk.Entry(self.library_menu, width=6)
+        self.points_entry.grid(row=0, column=5, padx=4)
+
+        self.points_entry.bind('<Return>', self.set_points)
+
         #-------------------------------------------------- canvas --------------------------------------------------#
         self.canvas = tk.Canvas(self, height=self.size, width=self.size, borderwidth=0, highlightthickness=0, background='black')
         self.canvas.grid(row=1, column=0)
@@ -137,6 +193,9 @@ class Canvas(tk.Frame):
         self.drawer.daemon = True
         self.drawer.start()
 
+        # index library
+        self.library.scan(callback=self.list_files)
+
     def wait(self):
         while True:
             if self.data:
@@ -155,16 +214,28 @@ class Canvas(tk.Frame):
                 
         while True:
             # get frame
-            index, total, frame = next(self.data)
+            try:
+                index, total, frame = next(self.data)
+            except StopIteration:
+                self.close_file()
+                return
+
+            # follow the playing item's frame store
+            if self.playlist:
+                self.store = self.playlist.store
 
             # update frame counter
-            self.update_frame_counter(index + 1, total)
+            self.update_frame_counter(index + 1, total, self.store.ratio if self.store else None)
 
             # update fps/pps
             if (end := time.time()) - self.start > 1:
                 self.update_fps_pps_counter(self.start, end)
                 self.start = time.time()
 
+            # send frame to all outputs
+            if self.transmit and self.fanout:
+                self.fanout.submit(frame, self.store)
+
             # draw frame
             self.draw_frame(frame)
             self.clear()
@@ -177,25 +248,24 @@ class Canvas(tk.Frame):
             
     def draw_frame(self, frame, px_size=3):
         """
-        Draws frame on canvas. If `self.transmit` is true, writes frame to serial.
+        Draws frame on canvas. While transmitting, the fan-out paces and writes the frame instead.
         """
 
-        x0, y0 = None, None
-        for point in frame:
-            # normalize point between [-1,1]
-            sign_x = 1 if point[0] == 0 else point[0]/abs(point[0])
-            sign_y = 1 if point[1] == 0 else point[1]/abs(point[1])
-            norm_x = min(abs(((point[0] + 32768) / 65535 * 2 - 1) * self.scale), 1) * sign_x
-            norm_y = min(abs(((point[1] + 32768) / 65535 * 2 - 1) * self.scale), 1) * sign_y
+        # the UI may change the transform while the frame is transformed
+        transform = self.transform.copy()
 
-            # draw point on canvas
-            if point[2]:
-                x = self.size/2 + self.size/2 * norm_x
-                y = self.size/2 - self.size/2 * norm_y
+        if self.store:
+            points = self.store.derive(frame, transform.params, lambda frame: self.transform_frame(frame, transform))
+        else:
+            points = self.transform_frame(frame, transform)
 
-                self.canvas.create_rectangle(x-px_size/2-1, y-px_size/2-1, x+px_size, y+px_size, fill='red', state='disabled')
+        x0, y0 = None, None
+        for norm_x, norm_y, x, y, status in points:
+            # draw point on canvas
+            if status:
+                self.canvas.create_rectangle(x-px_size/2-1, y-px_size/2-1, x+px_size, y+px_size, fill='red', state='disabled', tags='frame')
                 if x0 and y0:
-                    self.canvas.create_line(x0, y0, x, y, fill='red')
+                    self.canvas.create_line(x0, y0, x, y, fill='red', tags='frame')
 
                 x0, y0 = x, y
 
@@ -204,54 +274,123 @@ class Canvas(tk.Frame):
 
             # not transmitting - wait delay
             if not self.transmit:
-                wait_us(1000000/(self.play_speed*len(frame)))
-                self.point_count += 1
-
-            # transmitting - write to serial
-            else:
-                if self.ser.laser != point[2]:
-                    if point[2]:
-                        self.ser.send(f'laser on\n')
-                        self.ser.ready.wait(timeout=SERIAL_TIMEOUT)
-                        self.ser.laser = True   
-                    else:
-                        self.ser.send(f'laser off\n')
-                        self.ser.ready.wait(timeout=SERIAL_TIMEOUT)
-                        self.ser.laser = False
-
-                self.ser.send(f'move {norm_x} {norm_y}\n')
-                self.ser.ready.wait(timeout=SERIAL_TIMEOUT)
-
+                if self.points:
+                    self.wait_point()
+                else:
+                    wait_us(1000000/(self.play_speed*len(frame)))
                 self.point_count += 1
 
             # new data available
             if self.new_data:
                 return
 
+    def transform_frame(self, frame, transform = None):
+        """
+        Transforms frame with `transform`, or `self.transform` if not given, and maps it to canvas coordinates.
+
+        Returns:
+            list: points as normalized x, normalized y, canvas x, canvas y, status.
+        """
+
+        xs, ys, status = (transform or self.transform).apply(frame)
+        half = self.size/2
+
+        return list(zip(xs, ys, [half + half * x for x in xs], [half - half * y for y in ys], status))
+
     #-------------------------------------------------- canvas methods --------------------------------------------------#
     def clear(self):
         """
-        Clears the canvas.
+        Clears the drawn frame from the canvas.
+        """
+
+        self.canvas.delete('frame')
+
+    def show_library(self):
+        """
+        Shows thumbnails of the listed library files while nothing is playing. Clicking a thumbnail opens the file.
+        """
+
+        self.canvas.delete('library')
+        self.thumbnails = []
+
+        if self.data:
+            return
+
+        size = library.THUMBNAIL_SIZE
+        columns = max(self.size // size, 1)
+
+        for n, path in enumerate(self.files[0][:columns * columns]):
+            entry = self.library.entries.get(path)
+            if not (entry and entry.get('thumbnail') and os.path.exists(entry['thumbnail'])):
+                continue
+
+            self.thumbnails.append(tk.PhotoImage(file=entry['thumbnail']))
+            x, y = (n % columns) * size, (n // columns) * size
+
+            item = self.canvas.create_image(x, y, image=self.thumbnails[-1], anchor='nw', tags='library')
+            self.canvas.create_text(x + 4, y + size - 4, text=path.split('\\')[-1], fill='gray', anchor='sw', tags='library')
+            self.canvas.tag_bind(item, '<Button-1>', lambda _, n=n: self.open_thumbnail(n))
+
+    def open_thumbnail(self, n):
+        """
+        Opens the `n`-th listed library file.
         """
 
-        self.canvas.delete('all')
+        self.file_cbox.current(n)
+        self.open_file(self.file_cbox.get())
 
     #-------------------------------------------------- file methods --------------------------------------------------#
     def get_files(self):
         """
-        Gets ILDA files in the current directory and subdirectories.
+        Gets ILDA files in the current directory and subdirectories from the library, and rescans it in the background.
+        """
+
+        self.list_files()
+        self.library.scan(callback=self.list_files)
+
+    def list_files(self):
+        """
+        Lists library files sorted by `self.sort`, leaving out files with more than `self.max_points` points in a frame.
         """
 
-        src = os.path.dirname(__file__)
-        self.files[0] = glob.glob(f'{src}/**/*.ild', recursive=True)
+        self.files[0] = [entry['path'] for entry in self.library.files(sort=self.sort, max_points=self.max_points)]
         self.file_cbox['values'] = [file.split('\\')[-1] for file in (self.files[0] + self.files[1])]
 
+        if not self.data:
+            self.show_library()
+
+    def set_sort(self, event):
+        """
+        Sets the library sort order.
+        """
+
+        self.sort = SORT_KEYS[self.sort_cbox.get()]
+        self.list_files()
+
+    def set_max_points(self, event):
+        """
+        Sets the maximum points per frame of listed files. Empty shows all files.
+        """
+
+        value = self.max_points_entry.get().strip()
+        self.max_points = int(value) if value.isdigit() else None
+
+        if self.max_points is None:
+            self.max_points_entry.delete(0, 'end')
+
+        self.list_files()
+
     def browse_files(self):
         """
-        Opens file explorer.
+        Opens file explorer. Selecting several files plays them as a playlist.
         """
 
-        if file := filedialog.askopenfilename(filetypes=(('ILDA', '*.ild'), ('All Files', '*.*'))):
+        files = filedialog.askopenfilenames(filetypes=(('ILDA', '*.ild'), ('All Files', '*.*')))
+
+        if len(files) > 1:
+            self.open_playlist(playlist.Playlist(files, points = self.points))
+
+        elif file := next(iter(files), None):
             if file not in self.files:
                 self.files[1].append(file.replace('/', '\\'))
                 self.file_cbox['values'] = [file.split('\\')[-1] for file in (self.files[0] + self.files[1])]
@@ -260,7 +399,27 @@ class Canvas(tk.Frame):
 
     def open_file(self, file):
         """
-        Opens `file` and returns a generator object to `self.data`. Resets speed and counters.
+        Opens `file` and returns a generator object to `self.data`.
+        """
+
+        filepath = (self.files[0] + self.files[1])[self.file_cbox['values'].index(file)]
+        self.playlist = None
+        self.store = ilda.FrameStore()
+        self.open_data(ilda.unpack_ilda(filepath, filter = True, store = self.store, points = self.points))
+
+    def open_playlist(self, playlist):
+        """
+        Plays `playlist` and returns its frame generator to `self.data`.
+        """
+
+        self.file_cbox.set(f'Playlist ({len(playlist)} files)')
+        self.playlist = playlist
+        self.store = None
+        self.open_data(playlist.frames())
+
+    def open_data(self, data):
+        """
+        Sets `self.data` = `data`. Resets speed and counters.
         """
 
         self.play_speed = self.speed
@@ -269,8 +428,9 @@ class Canvas(tk.Frame):
         self.frame_count = 0
         self.point_count = 0
 
-        filepath = (self.files[0] + self.files[1])[self.file_cbox['values'].index(file)]
-        self.data = ilda.unpack_ilda(filepath, filter = True)
+        self.canvas.delete('library')
+
+        self.data = data
         self.new_data = True
 
     def close_file(self):
@@ -279,12 +439,16 @@ class Canvas(tk.Frame):
         """
 
         self.data = None
+        self.store = None
+        self.playlist = None
         self.new_data = True
 
         self.file_cbox.set('')
         self.frame_counter.config(text = "Frame: -- / --")
         self.fps_pps_counter.config(text = "-- / --")
 
+        self.show_library()
+
     #-------------------------------------------------- speed methods --------------------------------------------------#
     def entry_set_speed(self, event):
         """
@@ -316,6 +480,48 @@ class Canvas(tk.Frame):
         self.speed_entry.delete(0, 'end')
         self.speed_entry.insert(0, self.speed)
 
+        self.set_point_rate()
+
+    def set_points(self, event):
+        """
+        Sets the number of points every frame is resampled to. Empty plays frames as they are.
+        Reopens the current file.
+        """
+
+        value = self.points_entry.get().strip()
+        self.points = max(int(value), 2) if value.isdigit() else None
+
+        self.points_entry.delete(0, 'end')
+        if self.points:
+            self.points_entry.insert(0, self.points)
+
+        self.set_point_rate()
+
+        if self.data and not self.playlist and self.file_cbox.get():
+            self.open_file(self.file_cbox.get())
+
+    def set_point_rate(self):
+        """
+        Precomputes the point period from speed and points per frame.
+        """
+
+        self.point_period = 1000000000 / (self.speed * self.points) if self.points and self.speed else 0
+
+    def wait_point(self):
+        """
+        Waits for the next point at the fixed point rate. Points are scheduled from the previous one,
+        so drawing time does not slow the rate down.
+        """
+
+        self.next_point += self.point_period
+
+        # resync after a pause
+        if perf_counter_ns() - self.next_point > 1000000000:
+            self.next_point = perf_counter_ns()
+
+        while perf_counter_ns() < self.next_point:
+            time.sleep(0)
+
     def adjust_speed(self):
         """
         Tries to adjust speed to match requested fps within 5%
@@ -370,31 +576,47 @@ class Canvas(tk.Frame):
 
         scale = round(float(value))
         self.scale = scale / 100
+
+        # swap scale, then invalidate frames transformed with the old one
+        params = self.transform.params
+        self.transform.scale = self.scale
+        if self.store:
+            self.store.discard(params)
+
         self.scale_entry.delete(0, 'end')
         self.scale_entry.insert(0, scale)
 
     #-------------------------------------------------- counter methods --------------------------------------------------#
-    def update_frame_counter(self, current, total):
+    def update_frame_counter(self, current, total, ratio = None):
         """
-        Updates frame counter.
+        Updates frame counter. Shows the frame dedupe `ratio` if given.
         """
 
-        self.frame_counter.config(text = f'Frame: {current} / {total}')
+        if ratio:
+            self.frame_counter.config(text = f'Frame: {current} / {total}   ({ratio:.1f}x)')
+        else:
+            self.frame_counter.config(text = f'Frame: {current} / {total}')
 
     def update_fps_pps_counter(self, start, end):
         """
-        Updates fps/pps counters and adjusts speed.
+        Updates fps/pps counters and adjusts speed, unless playing at a fixed point rate.
+        While transmitting, shows the slowest output's fps/pps, the largest lag and the total dropped frames.
         """
 
         self.fps = round(self.frame_count / (end - start), 1)
         pps = round(self.point_count / (end - start), 1)
 
-        if (not self.transmit and self.play_speed >= 1000):
+        if self.transmit and self.fanout:
+            stats = self.fanout.stats()
+            fps, pps = min(s['fps'] for s in stats), min(s['pps'] for s in stats)
+            lag, dropped = max(s['lag'] for s in stats), sum(s['dropped'] for s in stats)
+            self.fps_pps_counter.config(text = f'{fps} / {pps}   LAG {lag}   DROPPED {dropped}')
+        elif (not self.transmit and self.play_speed >= 1000):
             self.fps_pps_counter.config(text = f'{self.fps} / {pps}   MAX')
         else:
             self.fps_pps_counter.config(text = f'{self.fps} / {pps}')
 
-        if self.settled:
+        if self.settled and not self.points:
             self.adjust_speed()
         else:
             self.settled = True
@@ -13,6 +13,7 @@ class Console(tk.Frame):
         baudrates = [f'{rate} baud' for rate in [9600, 1000000]]
 
         self.ser = ser
+        self.fanout = None
 
         #-------------------------------------------------- command line --------------------------------------------------#
         self.command = tk.Frame(self, height=21)
@@ -112,6 +113,8 @@ class Console(tk.Frame):
         if command:
             if command == 'clear':
                 self.clear()
+            elif command == 'stats':
+                self.print_stats()
             else:
                 self.print(f'> {command}')
                 if self.ser:
@@ -131,6 +134,15 @@ class Console(tk.Frame):
 
         self.console.see('end')
 
+    def print_stats(self):
+        """
+        Writes throughput, lag and dropped frames of each output to console.
+        """
+
+        if self.fanout:
+            for stats in self.fanout.stats():
+                self.print(f'{stats["name"]}: {stats["fps"]} fps / {stats["pps"]} pps, lag {stats["lag"]}, dropped {stats["dropped"]}, stalls {stats["stalls"]}', 'status')
+
     def clear(self):
         """
         Clears the console.
@@ -0,0 +1,193 @@
+import threading
+import queue
+import time
+from transform import Transform
+
+SERIAL_TIMEOUT = 1
+
+def text_protocol(xs, ys, status):
+    """
+    Encodes transformed points as `move`/`laser on`/`laser off` commands.
+
+    Returns:
+        list: commands <string>.
+    """
+
+    commands = []
+    laser = None
+    for x, y, s in zip(xs, ys, status):
+        if laser != s:
+            commands.append('laser on\n' if s else 'laser off\n')
+            laser = s
+
+        commands.append(f'move {x} {y}\n')
+
+    return commands
+
+PROTOCOLS = {
+    'text': text_protocol
+}
+
+class Output:
+    """
+    One output device. `ser` is either the app's serial port, whose listener thread reads the replies,
+    or a bare pyserial port that nothing else reads from.
+    """
+
+    def __init__(self, ser, transform: Transform = None, protocol = text_protocol, name: str = None):
+        self.ser = ser
+        self.transform = transform or Transform()
+        self.protocol = protocol
+        self.name = name
+
+        self.queue = queue.Queue(maxsize=2)
+
+        self.sequence = 0
+        self.frames = 0
+        self.points = 0
+        self.dropped = 0
+        self.stalls = 0
+        self.start = None
+
+    def encode(self, frame, store = None):
+        """
+        Encodes frame with this output's transform and protocol. Encoded frames are cached in `store`.
+
+        Returns:
+            list: commands <string>.
+        """
+
+        # the UI may change the transform while the frame is encoded
+        transform = self.transform.copy()
+
+        def encode(frame):
+            return self.protocol(*transform.apply(frame))
+
+        if store:
+            return store.derive(frame, (transform.params, self.protocol), encode)
+
+        return encode(frame)
+
+    def send(self, commands):
+        """
+        Writes `commands` to serial, waiting for a reply to each.
+
+        Returns:
+            int: commands not acknowledged in time.
+        """
+
+        stalls = 0
+
+        # app serial port - its listener reads replies and sets `ready`
+        if hasattr(self.ser, 'ready'):
+            for command in commands:
+                self.ser.send(command)
+                if not self.ser.ready.wait(timeout=SERIAL_TIMEOUT):
+                    stalls += 1
+
+        # bare serial port
+        else:
+            for command in commands:
+                self.ser.write(command.encode('utf-8'))
+                if not self.ser.readline():
+                    stalls += 1
+
+        return stalls
+
+class FanOut:
+    """
+    Drives several outputs from one decoded stream. Each output encodes and writes on its own thread.
+    Frames carry sequence numbers: an output starts frame n only once every output has finished frame n-1,
+    and an output that fell behind drops the frames the others already started.
+    """
+
+    def __init__(self, outputs: list):
+        self.outputs = outputs
+        self.submitted = 0
+        self.started = 0
+        self.condition = threading.Condition()
+
+        self.threads = [threading.Thread(target=self.run, args=(output,)) for output in outputs]
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+
+    def submit(self, frame, store = None):
+        """
+        Queues frame for every output. Blocks while the slowest output is more than a frame behind.
+        """
+
+        self.submitted += 1
+        for output in self.outputs:
+            output.queue.put((self.submitted, frame, store))
+
+    def run(self, output: Output):
+        """
+        Encodes and writes queued frames to `output`, aligning frame boundaries with the other outputs.
+        """
+
+        while True:
+            sequence, frame, store = output.queue.get()
+
+            if frame is None:
+                return
+
+            # drop frames the other outputs already moved past
+            if sequence < self.started:
+                with self.condition:
+                    output.sequence = sequence
+                    output.dropped += 1
+                    self.condition.notify_all()
+                continue
+
+            commands = output.encode(frame, store)
+
+            # wait for all outputs to finish the previous frame
+            with self.condition:
+                self.condition.wait_for(lambda: all(o.sequence >= sequence - 1 for o in self.outputs), timeout=SERIAL_TIMEOUT)
+                self.started = max(self.started, sequence)
+
+            if output.start is None:
+                output.start = time.time()
+
+            try:
+                stalls = output.send(commands)
+            except Exception:
+                stalls = len(commands)
+
+            with self.condition:
+                output.stalls += stalls
+                output.sequence = sequence
+                output.frames += 1
+                output.points += len(frame)
+                self.condition.notify_all()
+
+    def stats(self):
+        """
+        Gets per-output throughput and lag.
+
+        Returns:
+            list: name, fps, pps, lag in frames, dropped frames and unacknowledged commands of each output <dict>.
+        """
+
+        stats = []
+        for output in self.outputs:
+            elapsed = time.time() - output.start if output.start else 0
+            stats.append({
+                "name": output.name or getattr(output.ser, 'port', None),
+                "fps": round(output.frames / elapsed, 1) if elapsed else 0,
+                "pps": round(output.points / elapsed, 1) if elapsed else 0,
+                "lag": self.submitted - output.sequence,
+                "dropped": output.dropped,
+                "stalls": output.stalls
+            })
+
+        return stats
+
+    def close(self):
+        """
+        Stops the output threads once their queues drain.
+        """
+
+        for output in self.outputs:
+            output.queue.put((None, None, None))
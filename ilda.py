@@ -1,3 +1,27 @@
+import itertools
+import argparse
+import hashlib
+import struct
+import threading
+import bisect
+import heapq
+import math
+
+RECORD_SIZE = {
+    0: 8,
+    1: 6,
+    2: 3,
+    4: 10,
+    5: 8
+}
+
+RECORD_STRUCT = {
+    0: 'hhhBB',
+    1: 'hhBB',
+    4: 'hhhBBBB',
+    5: 'hhBBBB'
+}
+
 def read_ilda(file: str):
     """
     Reads ILDA file as binary.
@@ -10,7 +34,7 @@ def read_ilda(file: str):
         with open(rf'{file}', 'rb') as f:
             return f.read()
         
-def unpack_ilda(file: str, filter = True):
+def unpack_ilda(file: str, filter = True, store = None, points: int = None):
     """
     Reads ILDA file.
     
@@ -19,31 +43,91 @@ def unpack_ilda(file: str, filter = True):
     """
     
     if data := read_ilda(file):
-        return unpack_data(data, filter)
+        return unpack_data(data, filter, store, points)
         
-def unpack_data(data, filter: bool):
+def unpack_data(data, filter: bool, store = None, points: int = None):
     """
-    Reads ILDA data.
+    Reads ILDA data. If `points` is given, every frame is resampled to `points` records.
+    Identical frames are decoded, filtered and resampled once and share storage in `store`.
+    After the first pass, frames are replayed from memory without parsing.
 
     Yields:
         tuple: frame <int>, num_frams <int>, records <list>.
     """
 
+    if store is None:
+        store = FrameStore()
+
+    frames = []
     next_data = data
     while True:
         header, next_data = read_header(next_data)
 
-        # restart if EOF
+        # replay from memory if EOF
+        if header['num_records'] == 0:
+            break
+
+        size = header['num_records'] * RECORD_SIZE[header['format']]
+        payload, next_data = next_data[:size], next_data[size:]
+
+        # skip palettes
+        if header['format'] == 2:
+            continue
+
+        records = store.add(payload, header['format'], header['num_records'])
+        if filter:
+            records = store.derive(records, 'filtered', filter_records)
+        if points:
+            records = store.derive(records, ('resampled', points), lambda records: resample_records(records, points))
+
+        frames.append((header['frame'], header['num_frames'], records))
+        yield frames[-1]
+
+    while frames:
+        yield from frames
+
+def index_data(data):
+    """
+    Indexes ILDA data by walking the headers without decoding any records.
+
+    Returns:
+        list: offset <int> of each drawable frame header.
+    """
+
+    offsets = []
+    offset = 0
+    while len(data) - offset >= 32:
+        header, _ = read_header(data[offset:offset+32])
+
+        # stop at EOF
         if header['num_records'] == 0:
-            header, next_data = read_header(data)
+            break
+
+        # skip palettes
+        if header['format'] != 2:
+            offsets.append(offset)
+
+        offset += 32 + header['num_records'] * RECORD_SIZE[header['format']]
+
+    return offsets
 
-        records, next_data = read_records(next_data, **header)
+def scan_data(data):
+    """
+    Collects metadata from ILDA data by walking the headers.
+
+    Returns:
+        dict: format, number of frames, max and average points per frame.
+    """
 
-        if records:
-            if filter: 
-                yield header['frame'], header['num_frames'], filter_records(records)
-            else:
-                yield header['frame'], header['num_frames'], records
+    headers = [read_header(data[offset:offset+32])[0] for offset in index_data(data)]
+    points = [header['num_records'] for header in headers]
+
+    return {
+        "format": headers[0]['format'] if headers else None,
+        "frames": len(headers),
+        "max_points": max(points, default=0),
+        "avg_points": round(sum(points) / len(points), 1) if points else 0
+    }
 
 def read_header(data):
     """
@@ -72,15 +156,7 @@ def read_records(data, format, num_records, **kwargs):
         string: remaining data.
     """
 
-    record_size = {
-        "0": 8,
-        "1": 6,
-        "2": 3,
-        "4": 10,
-        "5": 8
-    }
-
-    size = record_size[f'{format}']
+    size = RECORD_SIZE[format]
 
     if format == 2:
         return None, data[num_records*size:]
@@ -147,3 +223,260 @@ def filter_records(records: list, tol: float = 0.001):
             filtered.append(records[i])
 
     return filtered
+
+def points_per_frame(pps: float, fps: float):
+    """
+    Gets the number of points per frame that plays at `fps` frames per second with a scanner running at `pps` points per second.
+
+    Returns:
+        int: points per frame.
+    """
+
+    return max(round(pps / fps), 2)
+
+def resample_records(records: list, count: int):
+    """
+    Redistributes lit and blanked records evenly along the frame's path so the frame has `count` records.
+    When adding records, every original record is kept and the new ones are spread over the segments
+    by length. When removing records, the first and last records and both ends of every blanking
+    transition are kept, and each run of equal status is resampled at equal arc-length steps.
+    A frame with more transitions than `count` keeps all of them.
+
+    Returns:
+        list: resampled records.
+    """
+
+    if len(records) < 2 or count < 2:
+        return (records * count)[:count]
+
+    # segment i runs from records[i] to records[i+1] with the status of records[i+1]
+    lengths = [math.hypot(x1 - x0, y1 - y0) for (x0, y0, _), (x1, y1, _) in zip(records, records[1:])]
+    total = sum(lengths)
+
+    if total == 0:
+        return (records + records[-1:] * count)[:count]
+
+    if count >= len(records):
+        # split extra records between segments by length, largest remainder first
+        extra = count - len(records)
+        shares = [extra * length / total for length in lengths]
+        split = [int(share) for share in shares]
+        for i in sorted(range(len(shares)), key=lambda i: split[i] - shares[i])[:extra - sum(split)]:
+            split[i] += 1
+
+        resampled = [records[0]]
+        for (x0, y0, _), (x1, y1, s), n in zip(records, records[1:], split):
+            resampled += [(x0 + (x1 - x0) * j / (n + 1), y0 + (y1 - y0) * j / (n + 1), s) for j in range(1, n + 1)]
+            resampled.append((x1, y1, s))
+
+        return resampled
+
+    # keep endpoints and blanking transitions
+    last = len(records) - 1
+    anchors = [i for i in range(len(records)) if i in (0, last) or records[i][2] != records[i-1][2] or records[i][2] != records[i+1][2]]
+    if len(anchors) >= count:
+        return [records[i] for i in anchors]
+
+    # give the remaining records to the runs between anchors, longest run per record first
+    runs = list(zip(anchors, anchors[1:]))
+    distance = list(itertools.accumulate(lengths, initial=0))
+    split = [0] * len(runs)
+    heap = [(-(distance[b] - distance[a]), n) for n, (a, b) in enumerate(runs) if b - a > 1]
+    heapq.heapify(heap)
+    for _ in range(count - len(anchors)):
+        _, n = heapq.heappop(heap)
+        a, b = runs[n]
+        split[n] += 1
+        if split[n] < b - a - 1:
+            heapq.heappush(heap, (-(distance[b] - distance[a]) / (split[n] + 1), n))
+
+    # sample each run at equal arc-length steps
+    resampled = [records[0]]
+    for (a, b), k in zip(runs, split):
+        for j in range(1, k + 1):
+            d = distance[a] + (distance[b] - distance[a]) * j / (k + 1)
+            i = min(max(bisect.bisect_right(distance, d) - 1, a), b - 1)
+            t = (d - distance[i]) / lengths[i] if lengths[i] else 0
+
+            (x0, y0, _), (x1, y1, _) = records[i], records[i+1]
+            resampled.append((x0 + (x1 - x0) * t, y0 + (y1 - y0) * t, records[a+1][2]))
+
+        resampled.append(records[b])
+
+    return resampled
+
+def export_ilda(src: str, dst: str, format: int = 5, filter = True, points: int = None):
+    """
+    Reads every frame of `src` once, filters and resamples it, and writes the result to `dst`.
+    """
+
+    if not (data := read_ilda(src)):
+        raise ValueError(f'cannot read ILDA file {src}')
+
+    frames = itertools.islice(unpack_data(data, filter, points=points), len(index_data(data)))
+    write_ilda(dst, [records for _, _, records in frames], format)
+
+def write_ilda(file: str, frames: list, format: int = 5, name: str = '', company: str = ''):
+    """
+    Writes `frames` to `file` as ILDA.
+    """
+
+    data = pack_data(frames, format, name, company)
+
+    with open(rf'{file}', 'wb') as f:
+        f.write(data)
+
+def pack_data(frames: list, format: int = 5, name: str = '', company: str = ''):
+    """
+    Packs frames as ILDA data, ended by an empty header.
+
+    Returns:
+        string: packed data.
+    """
+
+    chunks = []
+    for i, records in enumerate(frames):
+        chunks.append(pack_header(format, len(records), i, len(frames), name, company))
+        chunks.append(pack_records(records, format))
+
+    chunks.append(pack_header(format, 0, 0, len(frames), name, company))
+
+    return b''.join(chunks)
+
+def pack_header(format, num_records, frame, num_frames, name = '', company = ''):
+    """
+    Packs ILDA header.
+
+    Returns:
+        string: packed header.
+    """
+
+    return struct.pack('>4s3xB8s8sHHHBx', b'ILDA', format, name.encode('ascii', 'replace')[:8].ljust(8), company.encode('ascii', 'replace')[:8].ljust(8), num_records, frame, num_frames, 0)
+
+def pack_records(records: list, format: int):
+    """
+    Packs records with a single struct call. Lit records are full red, blanked records are black.
+
+    Returns:
+        string: packed records.
+    """
+
+    last = len(records) - 1
+    status = [(0 if s else 1 << 6) | (1 << 7 if i == last else 0) for i, (_, _, s) in enumerate(records)]
+    xs = [min(max(round(x), -32768), 32767) for x, _, _ in records]
+    ys = [min(max(round(y), -32768), 32767) for _, y, _ in records]
+    lit = [255 if s else 0 for _, _, s in records]
+
+    if format == 0:
+        fields = zip(xs, ys, itertools.repeat(0), status, itertools.repeat(0))
+    elif format == 1:
+        fields = zip(xs, ys, status, itertools.repeat(0))
+    elif format == 4:
+        fields = zip(xs, ys, itertools.repeat(0), status, itertools.repeat(0), itertools.repeat(0), lit)
+    elif format == 5:
+        fields = zip(xs, ys, status, itertools.repeat(0), itertools.repeat(0), lit)
+    else:
+        raise ValueError(f'cannot write ILDA format {format}')
+
+    return struct.pack('>' + RECORD_STRUCT[format] * len(records), *itertools.chain.from_iterable(fields))
+
+class FrameStore:
+    """
+    Content-addressed storage for decoded frames. Frames are keyed by a hash of their record payload,
+    so identical frames (and forms derived from them) are stored once and shared.
+    Safe to use from several threads; frames are decoded and derived outside the lock.
+    """
+
+    def __init__(self):
+        self.frames = {}
+        self.keys = {}
+        self.lock = threading.Lock()
+
+        self.count = 0
+        self.unique = 0
+
+    def add(self, payload, format, num_records):
+        """
+        Decodes the records in `payload` unless an identical frame is already stored.
+
+        Returns:
+            list: records.
+        """
+
+        key = hashlib.blake2b(bytes([format]) + payload, digest_size=16).digest()
+
+        with self.lock:
+            self.count += 1
+            if key in self.frames:
+                return self.frames[key]
+
+        records, _ = read_records(payload, format, num_records)
+
+        with self.lock:
+            if key not in self.frames:
+                self.frames[key] = records
+                self.keys[id(records)] = key
+                self.unique += 1
+
+            return self.frames[key]
+
+    def derive(self, records, form, func):
+        """
+        Gets `func(records)` stored under `form`, computing it only for the first copy of a frame.
+
+        Returns:
+            list: derived records.
+        """
+
+        with self.lock:
+            if (key := self.keys.get(id(records))) is not None:
+                key = (key, form)
+                if key in self.frames:
+                    return self.frames[key]
+
+        derived = func(records)
+        if key is None:
+            return derived
+
+        with self.lock:
+            if key not in self.frames:
+                self.frames[key] = derived
+                self.keys.setdefault(id(derived), key)
+
+            return self.frames[key]
+
+    def discard(self, form):
+        """
+        Drops all frames derived under `form`, and under compound forms starting with it, e.g. `(form, protocol)`.
+        """
+
+        def derived(key):
+            return isinstance(key, tuple) and (key[1] == form or isinstance(key[1], tuple) and key[1][:1] == (form,))
+
+        with self.lock:
+            for key in [key for key in self.frames if derived(key)]:
+                derived = self.frames.pop(key)
+                if self.keys.get(id(derived)) == key:
+                    del self.keys[id(derived)]
+
+    @property
+    def ratio(self):
+        """
+        Number of frames added per unique frame stored.
+        """
+
+        return self.count / self.unique if self.unique else 1
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export a filtered ILDA file.')
+    parser.add_argument('src', help='ILDA file to read')
+    parser.add_argument('dst', help='ILDA file to write')
+    parser.add_argument('-f', '--format', type=int, choices=[0, 1, 4, 5], default=5, help='ILDA format to write')
+    parser.add_argument('--no-filter', action='store_true', help='write records unfiltered')
+    parser.add_argument('-p', '--points', type=int, default=None, help='resample every frame to this many points')
+    parser.add_argument('--pps', type=float, default=None, help='resample every frame for this scanner rate, with --fps')
+    parser.add_argument('--fps', type=float, default=30, help='frame rate used with --pps')
+    args = parser.parse_args()
+
+    points = points_per_frame(args.pps, args.fps) if args.pps else args.points
+    export_ilda(args.src, args.dst, args.format, filter = not args.no_filter, points = points)
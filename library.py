@@ -0,0 +1,126 @@
+import threading
+import json
+import glob
+import os
+import ilda
+import thumbnail
+
+LIBRARY_FILE = '.ilda_library.json'
+
+THUMBNAIL_SIZE = 120
+
+class Library:
+    def __init__(self, root: str, file: str = None):
+        self.root = root
+        self.file = file or os.path.join(root, LIBRARY_FILE)
+
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.scanner = None
+
+        self.load()
+
+    def load(self):
+        """
+        Loads the index from `self.file`.
+        """
+
+        try:
+            with open(self.file, 'r') as f:
+                self.entries = {entry['path']: entry for entry in json.load(f)}
+        except (OSError, ValueError, KeyError, TypeError):
+            self.entries = {}
+
+    def save(self):
+        """
+        Writes the index to `self.file`.
+        """
+
+        with self.lock:
+            entries = list(self.entries.values())
+
+        try:
+            with open(self.file, 'w') as f:
+                json.dump(entries, f, indent=1)
+        except OSError:
+            pass
+
+    def scan(self, callback = None):
+        """
+        Starts rescanning `self.root` in the background. Calls `callback` when done.
+        """
+
+        if self.scanner and self.scanner.is_alive():
+            return
+
+        self.scanner = threading.Thread(target=self.rescan, args=(callback,))
+        self.scanner.daemon = True
+        self.scanner.start()
+
+    def rescan(self, callback = None):
+        """
+        Updates the index. Only files whose size or modification time changed are re-read.
+        Missing thumbnails are rendered in parallel. Files that fail to render are not retried until they change.
+        """
+
+        paths = glob.glob(f'{self.root}/**/*.ild', recursive=True)
+        changed = False
+
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+
+            entry = self.entries.get(path)
+            if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+                continue
+
+            try:
+                info = ilda.scan_data(ilda.read_ilda(path))
+            except (OSError, IndexError, KeyError):
+                continue
+
+            with self.lock:
+                self.entries[path] = {"path": path, "size": stat.st_size, "mtime": stat.st_mtime, **info}
+            changed = True
+
+        # drop deleted files
+        with self.lock:
+            for path in set(self.entries) - set(paths):
+                del self.entries[path]
+                changed = True
+
+            missing = [path for path, entry in self.entries.items() if entry['frames'] and not entry.get('thumbnail_error') and not os.path.exists(entry.get('thumbnail') or '')]
+
+        # render missing thumbnails
+        if missing:
+            thumbnails = thumbnail.render_files(missing, size=THUMBNAIL_SIZE)
+            with self.lock:
+                for path, paths in thumbnails.items():
+                    if path in self.entries:
+                        self.entries[path]['thumbnail'] = next(iter(paths), None)
+                        self.entries[path]['thumbnail_error'] = not paths
+            changed = True
+
+        if changed:
+            self.save()
+
+        if callback:
+            callback()
+
+    def files(self, sort: str = 'path', reverse: bool = False, max_points: int = None):
+        """
+        Lists indexed files sorted by `sort`. Files without drawable frames, or with more than `max_points` points in a frame, are left out.
+
+        Returns:
+            list: entries <dict>.
+        """
+
+        with self.lock:
+            entries = [entry for entry in self.entries.values() if entry['frames']]
+
+        if max_points is not None:
+            entries = [entry for entry in entries if entry['max_points'] <= max_points]
+
+        return sorted(entries, key=lambda entry: entry[sort], reverse=reverse)
@@ -3,13 +3,16 @@ import serial.tools.list_ports
 import tkinter as tk
 from tkinter import ttk
 import threading
+import argparse
 import canvas
 import console
+import fanout
+import transform
 
 SERIAL_TIMEOUT = 1
 
 class App(tk.Tk):
-    def __init__(self, title, size = 600):
+    def __init__(self, title, size = 600, outputs = ()):
         super().__init__()
 
         self.title(title)
@@ -24,32 +27,57 @@ class App(tk.Tk):
         self.canvas.ser = self.ser
         self.console.ser = self.ser
 
-        self.minsize(size, size + 55)
+        # drive the app port and any additional ports from the same stream
+        devices = [fanout.Output(self.ser, self.canvas.transform)]
+        for port, baudrate, tf, protocol in outputs:
+            try:
+                devices.append(fanout.Output(serial.serial_for_url(port, baudrate, timeout=SERIAL_TIMEOUT), tf, protocol, port))
+                self.console.print(f'OUTPUT: {port}', 'status')
+            except (serial.SerialException, ValueError):
+                self.console.print(f'CANNOT OPEN OUTPUT {port}', 'error')
+
+        self.fanout = fanout.FanOut(devices)
+        self.canvas.fanout = self.fanout
+        self.console.fanout = self.fanout
+
+        self.minsize(size, size + 80)
 
         # run
         self.mainloop()
 
-class _serial(serial.Serial):
-    def __init__(self, console, canvas, port = None, baudrate = None):
-        super().__init__()
+class _transmitter:
+    """
+    Laser command protocol over a serial port. Mixed in before a pyserial port class, see `_serial`.
+    """
 
-        self.port = port
-        if baudrate:
-            self.baudrate = baudrate
+    def start(self, console, canvas):
+        """
+        Sets up transmit state and starts the serial listener.
+        """
 
         self.console = console
         self.canvas = canvas
 
-        self.serial_listener_thread = threading.Thread(target=self.serial_listener)
-        self.serial_listener_thread.daemon = True
-        self.serial_listener_thread.start()
-
         self.ready = threading.Event()
         self.ready.set()
 
         self.laser = None
         self.enable_print = True
 
+        self.serial_listener_thread = threading.Thread(target=self.serial_listener)
+        self.serial_listener_thread.daemon = True
+        self.serial_listener_thread.start()
+
+    def available_ports(self):
+        """
+        Gets available serial ports.
+
+        Returns:
+            list: port names.
+        """
+
+        return [port.device for port in serial.tools.list_ports.comports()]
+
     def serial_listener(self):
         """
         Checks if serial connection is active. Prints recieved data to console.
@@ -57,7 +85,7 @@ class _serial(serial.Serial):
 
         while True:
             # get available serial ports
-            available_ports = [port.device for port in serial.tools.list_ports.comports()]
+            available_ports = self.available_ports()
 
             # if serial is open
             if self.is_open:
@@ -103,10 +131,77 @@ class _serial(serial.Serial):
                 string += '\n'
             
             try:
-                self.write(string.encode('utf-8'))
+                # clear before writing so a fast reply is not lost
                 self.ready.clear()
+                self.write(string.encode('utf-8'))
             except:
-                pass
+                self.ready.set()
+
+class _serial(_transmitter, serial.Serial):
+    def __init__(self, console, canvas, port = None, baudrate = None):
+        serial.Serial.__init__(self)
+
+        self.port = port
+        if baudrate:
+            self.baudrate = baudrate
+
+        self.start(console, canvas)
+
+def parse_output(spec: str):
+    """
+    Parses an output spec `PORT[:BAUDRATE][,OPTION=VALUE...]`. Options are scale, rotate, translate=X/Y,
+    mirror=x|y|xy, keystone=X/Y, clip=on|off and protocol. PORT may be a pyserial URL like `socket://host:port`.
+
+    Returns:
+        string: port.
+        int: baudrate.
+        Transform: transform.
+        function: protocol.
+    """
+
+    port, *options = spec.split(',')
+
+    # a baudrate suffix is numeric, and a URL keeps its own host:port
+    head, _, baudrate = port.rpartition(':')
+    if head and baudrate.isdigit() and ('://' not in head or ':' in head.partition('://')[2]):
+        port, baudrate = head, int(baudrate)
+    else:
+        baudrate = 1000000
+
+    tf = transform.Transform()
+    protocol = fanout.text_protocol
+
+    for option in options:
+        key, _, value = option.partition('=')
+
+        try:
+            if key in ['scale', 'rotate']:
+                setattr(tf, key, float(value))
+            elif key in ['translate', 'keystone']:
+                x, _, y = value.partition('/')
+                setattr(tf, key, (float(x), float(y or 0)))
+            elif key == 'mirror' and set(value) <= set('xy'):
+                tf.mirror = ('x' in value, 'y' in value)
+            elif key == 'clip' and value in ['on', 'off']:
+                tf.clip = value == 'on'
+            elif key == 'protocol' and value in fanout.PROTOCOLS:
+                protocol = fanout.PROTOCOLS[value]
+            else:
+                raise ValueError
+        except ValueError:
+            raise ValueError(f'invalid output option {option}')
+
+    return port, baudrate, tf, protocol
 
 if __name__ == '__main__':
-    App('ILDA Reader')
+    parser = argparse.ArgumentParser(description='Read and preview ILDA files, and communicate using serial.')
+    parser.add_argument('-o', '--output', action='append', default=[], metavar='PORT[:BAUDRATE][,OPTION=VALUE...]',
+                        help='additional output port with its own transform, may be repeated, e.g. /dev/ttyUSB1:1000000,scale=0.8,rotate=90,mirror=x')
+    args = parser.parse_args()
+
+    try:
+        outputs = [parse_output(output) for output in args.output]
+    except ValueError as e:
+        parser.error(str(e))
+
+    App('ILDA Reader', outputs=outputs)
@@ -0,0 +1,150 @@
+import threading
+import itertools
+import time
+import ilda
+
+PRELOAD_FRAMES = 8
+
+class PlaylistItem:
+    def __init__(self, file: str, loops: int = 1, duration: float = None):
+        self.file = file
+        self.loops = loops
+        self.duration = duration
+
+class Playlist:
+    def __init__(self, files = (), loops = 1, filter = True, repeat = True, points = None):
+        self.items = []
+        self.filter = filter
+        self.repeat = repeat
+        self.points = points
+
+        # store of the playing item
+        self.store = None
+
+        self.loaded = {}
+        self.loaders = {}
+
+        for file in files:
+            if isinstance(file, PlaylistItem):
+                self.items.append(file)
+            else:
+                self.add(file, loops)
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, file: str, loops: int = 1, duration: float = None):
+        """
+        Appends `file` to the playlist. If `duration` is given, the item plays for `duration` seconds instead of `loops` times.
+        """
+
+        self.items.append(PlaylistItem(file, loops, duration))
+
+    def preload(self, position: int):
+        """
+        Starts indexing and decoding the first frames of the item at `position` in the background.
+        """
+
+        if position in self.loaders:
+            return
+
+        self.loaders[position] = threading.Thread(target=self.load, args=(position,))
+        self.loaders[position].daemon = True
+        self.loaders[position].start()
+
+    def load(self, position: int):
+        """
+        Reads, indexes and decodes the first `PRELOAD_FRAMES` frames of the item at `position`.
+        Each item gets its own frame store, freed when the item finishes.
+        """
+
+        index, frames, first = [], None, []
+        store = ilda.FrameStore()
+
+        try:
+            if data := ilda.read_ilda(self.items[position].file):
+                if index := ilda.index_data(data):
+                    frames = ilda.unpack_data(data, self.filter, store, self.points)
+                    first = [next(frames) for _ in range(min(PRELOAD_FRAMES, len(index)))]
+
+        # unreadable or malformed file
+        except (OSError, KeyError, IndexError, StopIteration):
+            index, frames, first = [], None, []
+
+        finally:
+            self.loaded[position] = index, frames, first, store
+
+    def take(self, position: int):
+        """
+        Waits for the item at `position` to finish preloading.
+
+        Returns:
+            list: frame offsets.
+            generator: frame generator.
+            list: preloaded frames.
+            FrameStore: frame store.
+        """
+
+        self.preload(position)
+        self.loaders.pop(position).join()
+
+        return self.loaded.pop(position)
+
+    def frames(self):
+        """
+        Plays the playlist. The next item is preloaded while the current one plays, so transitions happen on the frame boundary without stalling.
+
+        Yields:
+            tuple: frame <int>, num_frames <int>, records <list>.
+        """
+
+        if not self.items:
+            return
+
+        position = 0
+        empty = 0
+        while empty < len(self.items):
+            item = self.items[position]
+            index, frames, first, store = self.take(position)
+
+            # preload next item
+            last = position + 1 == len(self.items)
+            position = 0 if last else position + 1
+            if not last or self.repeat:
+                self.preload(position)
+
+            # skip unreadable items
+            if not index:
+                empty += 1
+            else:
+                empty = 0
+                self.store = store
+
+                start = time.time()
+                count = 0
+                loops = 0
+                try:
+                    for frame in itertools.chain(first, frames):
+                        yield frame
+
+                        # count completed loops
+                        count += 1
+                        if count == len(index):
+                            count = 0
+                            loops += 1
+                            if item.duration is None and loops >= item.loops:
+                                break
+
+                        if item.duration is not None and time.time() - start >= item.duration:
+                            break
+
+                # malformed records past the preloaded frames
+                except (KeyError, IndexError):
+                    pass
+
+            # free the item's frames
+            del frames, first, store
+            self.store = None
+
+            if last and not self.repeat:
+                return
@@ -0,0 +1,242 @@
+from serial.urlhandler import protocol_loop
+import threading
+import itertools
+import argparse
+import time
+import os
+import ilda
+import fanout
+import main
+
+def wait(delay):
+    target = time.perf_counter() + delay
+    while time.perf_counter() < target:
+        time.sleep(0)
+
+class SimulatedLaser:
+    """
+    Simulated laser device on a pseudo-terminal. Open `port` with serial as if it were the microcontroller.
+    Implements `move <x> <y>`, `laser on` and `laser off`, replying one line per command.
+    Needs a POSIX system; elsewhere, benchmark against `loop://` instead.
+    """
+
+    def __init__(self, baudrate: int = 1000000, latency: float = 0.0001, buffer_size: int = 64):
+        if os.name != 'posix':
+            raise OSError('simulated laser needs a pseudo-terminal, use loop:// instead')
+
+        import tty
+
+        self.baudrate = baudrate
+        self.latency = latency
+        self.buffer_size = buffer_size
+
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+
+        self.x, self.y = 0.0, 0.0
+        self.laser = False
+
+        self.commands = 0
+        self.overflows = 0
+
+        self.running = True
+        self.device_thread = threading.Thread(target=self.run)
+        self.device_thread.daemon = True
+        self.device_thread.start()
+
+    def run(self):
+        """
+        Reads commands from the pty, simulating wire time, receive buffer size and processing latency.
+        """
+
+        buffer = b''
+        while self.running:
+            try:
+                data = os.read(self.master, 1024)
+            except OSError:
+                return
+
+            # simulate wire time at 10 bits per byte
+            wait(len(data) * 10 / self.baudrate)
+
+            buffer += data
+            if len(buffer) > self.buffer_size:
+                buffer = b''
+                self.overflows += 1
+                self.respond('invalid: buffer overflow')
+                continue
+
+            while b'\n' in buffer:
+                line, _, buffer = buffer.partition(b'\n')
+                wait(self.latency)
+                self.respond(self.execute(line.decode('utf-8', 'replace').strip()))
+
+    def execute(self, command: str):
+        """
+        Executes `command`.
+
+        Returns:
+            string: response.
+        """
+
+        self.commands += 1
+        args = command.split()
+
+        if args == ['laser', 'on']:
+            self.laser = True
+        elif args == ['laser', 'off']:
+            self.laser = False
+        elif len(args) == 3 and args[0] == 'move':
+            try:
+                self.x, self.y = float(args[1]), float(args[2])
+            except ValueError:
+                return f'invalid: {command}'
+        else:
+            return f'invalid: {command}'
+
+        return 'ok'
+
+    def respond(self, string: str):
+        """
+        Writes `string` ended by `'\\n'` back to the host.
+        """
+
+        wait((len(string) + 1) * 10 / self.baudrate)
+        os.write(self.master, f'{string}\n'.encode('utf-8'))
+
+    def close(self):
+        """
+        Stops the device and closes the pty.
+        """
+
+        self.running = False
+        os.close(self.slave)
+        os.close(self.master)
+
+class _console:
+    """
+    Console stand-in that counts error replies.
+    """
+
+    def __init__(self):
+        self.errors = 0
+
+    def print(self, string: str, tag = None):
+        if tag == 'error':
+            self.errors += 1
+
+class _canvas:
+    """
+    Canvas stand-in for the serial listener.
+    """
+
+    def enable_buttons(self):
+        pass
+
+    def disable_buttons(self):
+        pass
+
+class _pty_serial(main._serial):
+    """
+    App serial port that treats the simulated laser's pty as an available port.
+    """
+
+    def available_ports(self):
+        return [self.port]
+
+class _loop_serial(main._transmitter, protocol_loop.Serial):
+    """
+    App serial protocol over `loop://`. Every command is echoed back, acting as a device that replies instantly.
+    """
+
+    def __init__(self, console, canvas, baudrate = None):
+        protocol_loop.Serial.__init__(self)
+
+        self.port = 'loop://'
+        if baudrate:
+            self.baudrate = baudrate
+
+        self.start(console, canvas)
+
+    def available_ports(self):
+        return [self.port]
+
+def benchmark(file: str, device: SimulatedLaser = None, num_frames: int = None, baudrate: int = 1000000):
+    """
+    Transmits frames of `file` through the app's serial class and `fanout.Output`, the path the app transmits on.
+    Transmits to `device`, or to `loop://` if no device is given.
+
+    Returns:
+        dict: frames, points, commands, pps, frame latency (mean, p99, max) in ms, stalls, errors, overflows.
+    """
+
+    data = ilda.read_ilda(file)
+    num_frames = num_frames or len(ilda.index_data(data))
+    frames = itertools.islice(ilda.unpack_data(data, True), num_frames)
+
+    console = _console()
+    if device:
+        ser = _pty_serial(console, _canvas(), device.port, device.baudrate)
+    else:
+        ser = _loop_serial(console, _canvas(), baudrate)
+
+    # wait for the listener to open the port
+    deadline = time.time() + main.SERIAL_TIMEOUT
+    while not ser.is_open and time.time() < deadline:
+        time.sleep(0.01)
+
+    output = fanout.Output(ser)
+
+    latencies = []
+    stalls = 0
+    points = 0
+    commands = 0
+
+    start = time.perf_counter()
+    for _, _, frame in frames:
+        encoded = output.encode(frame)
+
+        sent = time.perf_counter()
+        stalls += output.send(encoded)
+        latencies.append(time.perf_counter() - sent)
+
+        points += len(frame)
+        commands += len(encoded)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+
+    return {
+        "frames": num_frames,
+        "points": points,
+        "commands": commands,
+        "pps": round(points / elapsed, 1) if elapsed else 0,
+        "latency_mean": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0,
+        "latency_p99": round(latencies[int(len(latencies) * 0.99)] * 1000, 3) if latencies else 0,
+        "latency_max": round(latencies[-1] * 1000, 3) if latencies else 0,
+        "stalls": stalls,
+        "errors": console.errors,
+        "overflows": device.overflows if device else 0
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark serial transmission of an ILDA file against a simulated laser.')
+    parser.add_argument('file', help='ILDA file')
+    parser.add_argument('-b', '--baudrate', type=int, default=1000000, help='simulated baudrate')
+    parser.add_argument('-l', '--latency', type=float, default=0.0001, help='processing latency per command (s)')
+    parser.add_argument('-s', '--buffer-size', type=int, default=64, help='receive buffer size (bytes)')
+    parser.add_argument('-n', '--frames', type=int, default=None, help='frames to transmit (default one pass)')
+    parser.add_argument('--loop', action='store_true', help='transmit to loop:// instead of a simulated laser')
+    args = parser.parse_args()
+
+    device = None
+    if not args.loop:
+        device = SimulatedLaser(args.baudrate, args.latency, args.buffer_size)
+        print(f'SIMULATED LASER ON {device.port}')
+
+    for key, value in benchmark(args.file, device, args.frames, args.baudrate).items():
+        print(f'{key}: {value}')
+
+    if device:
+        device.close()
@@ -0,0 +1,137 @@
+import pytest
+import itertools
+import ilda
+
+FRAMES = [
+    [(-32768, 32767, False), (0, 0, True), (1000, -1000, True), (32767, -32768, True)],
+    [(5, 5, True), (-5, 5, False), (-5, -5, True)],
+    [(0, 0, True), (0, 0, True)]
+]
+
+def unpack_once(data, filter = False):
+    return [records for _, _, records in itertools.islice(ilda.unpack_data(data, filter), len(ilda.index_data(data)))]
+
+@pytest.mark.parametrize('format', [0, 1, 4, 5])
+def test_pack_unpack_round_trip(format):
+    data = ilda.pack_data(FRAMES, format)
+
+    assert len(ilda.index_data(data)) == len(FRAMES)
+    assert unpack_once(data) == FRAMES
+    assert ilda.scan_data(data)['format'] == format
+
+def test_pack_frame_numbers():
+    data = ilda.pack_data(FRAMES)
+    frames = list(itertools.islice(ilda.unpack_data(data, False), len(FRAMES)))
+
+    assert [(frame, num_frames) for frame, num_frames, _ in frames] == [(i, len(FRAMES)) for i in range(len(FRAMES))]
+
+def test_pack_unknown_format():
+    with pytest.raises(ValueError):
+        ilda.pack_data(FRAMES, 2)
+
+def test_export_unreadable(tmp_path):
+    with pytest.raises(ValueError):
+        ilda.export_ilda(str(tmp_path / 'show.txt'), str(tmp_path / 'out.ild'))
+
+def test_export_round_trip(tmp_path):
+    src, dst = tmp_path / 'src.ild', tmp_path / 'dst.ild'
+    ilda.write_ilda(str(src), FRAMES, 1)
+    ilda.export_ilda(str(src), str(dst), 4, filter = False)
+
+    assert unpack_once(ilda.read_ilda(str(dst))) == FRAMES
+
+GAP = [(-30000, 0, False), (-30000, 0, True), (-10000, 0, True), (10000, 10000, False), (10000, 10000, True), (30000, 10000, True)]
+
+LINES = [(0, 0, False)] + [(i * 100, 0, True) for i in range(11)] + [(1000, 500, False)] + [(1000, 500 + i * 100, True) for i in range(6)]
+
+def transitions(records):
+    return [(round(x0), round(y0), s0, s1) for (x0, y0, s0), (_, _, s1) in zip(records, records[1:]) if s0 != s1]
+
+def on_strokes(records):
+    return all(y == 0 and 0 <= x <= 1000 or x == 1000 and 500 <= y <= 1000 for x, y, s in records if s)
+
+@pytest.mark.parametrize('count', [8, 10, 14, 19, 40])
+def test_resample_count_endpoints_blanking(count):
+    resampled = ilda.resample_records(LINES, count)
+
+    assert len(resampled) == count
+    assert resampled[0] == LINES[0] and resampled[-1] == LINES[-1]
+    assert transitions(resampled) == transitions(LINES)
+    assert on_strokes(resampled)
+
+def test_resample_keeps_blanking_gap():
+    resampled = ilda.resample_records(GAP, 3)
+
+    assert resampled == GAP
+
+def test_points_per_frame():
+    assert ilda.points_per_frame(30000, 30) == 1000
+    assert ilda.points_per_frame(10, 30) == 2
+
+def add_frame(store, records, format = 5):
+    return store.add(ilda.pack_records(records, format), format, len(records))
+
+def test_store_shares_identical_frames():
+    store = ilda.FrameStore()
+    first = add_frame(store, FRAMES[0])
+
+    assert first == FRAMES[0]
+    assert add_frame(store, FRAMES[0]) is first
+    assert add_frame(store, FRAMES[1]) is not first
+
+def test_store_ratio():
+    store = ilda.FrameStore()
+    assert store.ratio == 1
+
+    for records in [FRAMES[0], FRAMES[0], FRAMES[0], FRAMES[1]]:
+        add_frame(store, records)
+
+    assert store.ratio == 2
+
+def test_store_derives_once_per_frame():
+    store = ilda.FrameStore()
+    calls = []
+
+    def derive(records):
+        calls.append(records)
+        return list(reversed(records))
+
+    frames = [add_frame(store, records) for records in [FRAMES[0], FRAMES[0], FRAMES[1]]]
+    derived = [store.derive(records, 'reversed', derive) for records in frames]
+
+    assert len(calls) == 2
+    assert derived[0] is derived[1]
+    assert derived[2] == list(reversed(FRAMES[1]))
+
+    # frames not in the store are derived every time
+    assert store.derive(list(FRAMES[2]), 'reversed', derive) == list(reversed(FRAMES[2]))
+    assert len(calls) == 3
+
+def test_store_discard_form():
+    store = ilda.FrameStore()
+    records = add_frame(store, FRAMES[0])
+    calls = []
+
+    def derive(records):
+        calls.append(records)
+        return list(records)
+
+    store.derive(records, 'a', derive)
+    store.derive(records, 'b', derive)
+    store.discard('a')
+
+    store.derive(records, 'a', derive)
+    store.derive(records, 'b', derive)
+
+    assert len(calls) == 3
+    assert add_frame(store, FRAMES[0]) is records
+
+def test_store_discard_compound_form():
+    store = ilda.FrameStore()
+    records = add_frame(store, FRAMES[0])
+
+    for scale in range(50):
+        store.derive(records, (('transform', scale), 'text'), list)
+        store.discard(('transform', scale))
+
+    assert len(store.frames) == 1
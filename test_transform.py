@@ -0,0 +1,67 @@
+import pytest
+import ilda
+from transform import Transform
+
+FRAME = [(-32768, -32768, False), (32767, 32767, True), (0, 0, True)]
+
+def approx(values):
+    return pytest.approx(values, abs=1e-4)
+
+def test_apply_normalizes():
+    xs, ys, status = Transform().apply(FRAME)
+
+    assert xs == approx([-1, 1, 0])
+    assert ys == approx([-1, 1, 0])
+    assert status == [False, True, True]
+
+def test_apply_empty():
+    assert Transform().apply([]) == ([], [], [])
+
+def test_apply_scale_mirror_translate():
+    xs, ys, _ = Transform(scale=0.5, mirror=(True, False), translate=(0.25, -0.25)).apply(FRAME)
+
+    assert xs == approx([0.75, -0.25, 0.25])
+    assert ys == approx([-0.75, 0.25, -0.25])
+
+def test_apply_rotate():
+    xs, ys, _ = Transform(rotate=90).apply([(32767, 0, True)])
+
+    assert xs == approx([0])
+    assert ys == approx([1])
+
+def test_apply_clip():
+    assert Transform(scale=2).apply(FRAME)[0] == approx([-1, 1, 0])
+    assert Transform(scale=2, clip=False).apply(FRAME)[0] == approx([-2, 2, 0])
+
+def test_copy_is_independent():
+    transform = Transform(scale=0.5)
+    copy = transform.copy()
+    transform.scale = 1
+
+    assert copy.params != transform.params
+    assert copy.apply(FRAME)[0] == approx([-0.5, 0.5, 0])
+
+def test_cache_follows_scale():
+    store = ilda.FrameStore()
+    frame = store.add(ilda.pack_records(FRAME, 5), 5, len(FRAME))
+    transform = Transform(scale=0.5)
+
+    def derive(transform, change = None):
+        copy = transform.copy()
+
+        def apply(frame):
+            # scale changes and the old scale is discarded while the frame is transformed
+            if change:
+                params = transform.params
+                transform.scale = change
+                store.discard(params)
+            return copy.apply(frame)
+
+        return store.derive(frame, copy.params, apply)
+
+    assert derive(transform, change=1)[0] == approx([-0.5, 0.5, 0])
+    assert derive(transform)[0] == approx([-1, 1, 0])
+
+    # back to the old scale
+    transform.scale = 0.5
+    assert derive(transform)[0] == approx([-0.5, 0.5, 0])
@@ -0,0 +1,215 @@
+from multiprocessing import Pool
+import argparse
+import tempfile
+import hashlib
+import struct
+import zlib
+import glob
+import os
+import ilda
+import transform
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), '.thumbnails')
+
+COLOR = (255, 0, 0)
+
+def render_frame(frame, size: int = 128, scale: float = 1, px_size: int = 1):
+    """
+    Renders frame headless, using the same normalization and scale as the canvas.
+
+    Returns:
+        bytearray: RGB pixels.
+    """
+
+    pixels = bytearray(size * size * 3)
+
+    def plot(x, y):
+        if 0 <= x < size and 0 <= y < size:
+            i = (y * size + x) * 3
+            pixels[i:i+3] = bytes(COLOR)
+
+    x0, y0 = None, None
+    for norm_x, norm_y, status in zip(*transform.Transform(scale=scale).apply(frame)):
+        if status:
+            x = round((size - 1)/2 + (size - 1)/2 * norm_x)
+            y = round((size - 1)/2 - (size - 1)/2 * norm_y)
+
+            # draw point
+            for dx in range(-px_size, px_size + 1):
+                for dy in range(-px_size, px_size + 1):
+                    plot(x + dx, y + dy)
+
+            # draw line from previous point (Bresenham)
+            if x0 is not None:
+                dx, dy = abs(x - x0), -abs(y - y0)
+                sx, sy = (1 if x > x0 else -1), (1 if y > y0 else -1)
+                err = dx + dy
+                while True:
+                    plot(x0, y0)
+                    if x0 == x and y0 == y:
+                        break
+                    e2 = 2*err
+                    if e2 >= dy:
+                        err += dy
+                        x0 += sx
+                    if e2 <= dx:
+                        err += dx
+                        y0 += sy
+
+            x0, y0 = x, y
+
+        else:
+            x0, y0 = None, None
+
+    return pixels
+
+def write_png(file: str, pixels, width: int, height: int):
+    """
+    Writes RGB pixels to `file` as PNG. The file is written to a temporary file first and moved into place,
+    so a crashed or concurrent writer never leaves a partial file.
+    """
+
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data))
+
+    stride = width * 3
+    raw = b''.join(b'\x00' + bytes(pixels[y*stride:(y+1)*stride]) for y in range(height))
+
+    fd, temp = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(os.path.abspath(file)))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(b'\x89PNG\r\n\x1a\n')
+            f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+            f.write(chunk(b'IDAT', zlib.compress(raw)))
+            f.write(chunk(b'IEND', b''))
+
+        os.replace(temp, file)
+    except:
+        os.remove(temp)
+        raise
+
+def read_png(file: str):
+    """
+    Reads RGB pixels from a PNG written by `write_png`.
+
+    Returns:
+        bytearray: RGB pixels.
+        int: width.
+        int: height.
+    """
+
+    with open(file, 'rb') as f:
+        data = f.read()
+
+    width, height = struct.unpack('>II', data[16:24])
+
+    idat = b''
+    offset = 8
+    while offset < len(data):
+        length = struct.unpack('>I', data[offset:offset+4])[0]
+        if data[offset+4:offset+8] == b'IDAT':
+            idat += data[offset+8:offset+8+length]
+        offset += 12 + length
+
+    raw = zlib.decompress(idat)
+    stride = width * 3
+    pixels = bytearray(b''.join(raw[y*(stride+1)+1:(y+1)*(stride+1)] for y in range(height)))
+
+    return pixels, width, height
+
+def render_file(file: str, frames = (0,), size: int = 128, scale: float = 1):
+    """
+    Renders selected frames of `file` to PNG thumbnails. Thumbnails are cached by file hash.
+
+    Returns:
+        list: thumbnail paths, empty if the file is unreadable or malformed.
+    """
+
+    if not (data := ilda.read_ilda(file)):
+        return []
+
+    digest = hashlib.sha1(data).hexdigest()
+    index = ilda.index_data(data)
+    if not index:
+        return []
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    paths = []
+    for frame in frames:
+        frame = frame % len(index)
+        path = os.path.join(CACHE_DIR, f'{digest}_{frame}_{size}_{round(scale * 100)}.png')
+
+        if not os.path.exists(path):
+            try:
+                header, next_data = ilda.read_header(data[index[frame]:])
+                records, _ = ilda.read_records(next_data, **header)
+                pixels = render_frame(ilda.filter_records(records), size, scale)
+
+            # truncated or malformed frame
+            except (IndexError, KeyError, struct.error):
+                return []
+
+            write_png(path, pixels, size, size)
+
+        paths.append(path)
+
+    return paths
+
+def render_files(files: list, frames = (0,), size: int = 128, scale: float = 1, processes: int = None):
+    """
+    Renders thumbnails of `files` in parallel across cores.
+
+    Returns:
+        dict: thumbnail paths <list> by file.
+    """
+
+    with Pool(processes) as pool:
+        paths = pool.starmap(render_file, [(file, frames, size, scale) for file in files])
+
+    return dict(zip(files, paths))
+
+def contact_sheet(files: list, output: str, frames = (0,), size: int = 128, scale: float = 1, columns: int = 8, processes: int = None):
+    """
+    Renders thumbnails of `files` and tiles them into one PNG contact sheet.
+    """
+
+    thumbnails = [path for paths in render_files(files, frames, size, scale, processes).values() for path in paths]
+    if not thumbnails:
+        return
+
+    columns = min(columns, len(thumbnails))
+    rows = -(-len(thumbnails) // columns)
+    width, height = columns * size, rows * size
+
+    sheet = bytearray(width * height * 3)
+    for n, path in enumerate(thumbnails):
+        pixels, _, _ = read_png(path)
+        x, y = (n % columns) * size, (n // columns) * size
+
+        for row in range(size):
+            i = ((y + row) * width + x) * 3
+            sheet[i:i+size*3] = pixels[row*size*3:(row+1)*size*3]
+
+    write_png(output, sheet, width, height)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Render ILDA thumbnails or a contact sheet.')
+    parser.add_argument('path', help='ILDA file or directory')
+    parser.add_argument('-o', '--output', help='contact sheet file')
+    parser.add_argument('-f', '--frames', type=int, nargs='+', default=[0], help='frames to render')
+    parser.add_argument('-s', '--size', type=int, default=128, help='thumbnail size')
+    parser.add_argument('-c', '--columns', type=int, default=8, help='contact sheet columns')
+    parser.add_argument('-j', '--processes', type=int, default=None, help='worker processes')
+    args = parser.parse_args()
+
+    if os.path.isdir(args.path):
+        files = sorted(glob.glob(f'{args.path}/**/*.ild', recursive=True))
+    else:
+        files = [args.path]
+
+    if args.output:
+        contact_sheet(files, args.output, args.frames, args.size, columns=args.columns, processes=args.processes)
+    else:
+        for file, paths in render_files(files, args.frames, args.size, processes=args.processes).items():
+            print(file, *paths)
@@ -0,0 +1,68 @@
+import math
+
+class Transform:
+    def __init__(self, scale: float = 1, rotate: float = 0, translate = (0, 0), mirror = (False, False), keystone = (0, 0), clip: bool = True):
+        self.scale = scale
+        self.rotate = rotate
+        self.translate = translate
+        self.mirror = mirror
+        self.keystone = keystone
+        self.clip = clip
+
+    @property
+    def params(self):
+        """
+        Transform parameters, used as the cache key for transformed frames.
+        """
+
+        return ('transform', self.scale, self.rotate, tuple(self.translate), tuple(self.mirror), tuple(self.keystone), self.clip)
+
+    def copy(self):
+        """
+        Copies the transform, so a frame can be transformed and cached under parameters that cannot change midway.
+
+        Returns:
+            Transform: copy.
+        """
+
+        return Transform(self.scale, self.rotate, tuple(self.translate), tuple(self.mirror), tuple(self.keystone), self.clip)
+
+    def apply(self, frame):
+        """
+        Transforms a whole frame: normalizes to [-1,1], then mirrors, scales, rotates (degrees), keystones, translates and clips to the window.
+
+        Returns:
+            list: x-coordinates <float>.
+            list: y-coordinates <float>.
+            list: statuses <bool>.
+        """
+
+        if not frame:
+            return [], [], []
+
+        xs, ys, status = zip(*frame)
+
+        # mirror, scale and rotate as one matrix
+        sx = -self.scale if self.mirror[0] else self.scale
+        sy = -self.scale if self.mirror[1] else self.scale
+        cos, sin = math.cos(math.radians(self.rotate)), math.sin(math.radians(self.rotate))
+        a, b, c, d = cos * sx, -sin * sy, sin * sx, cos * sy
+        tx, ty = self.translate
+
+        # normalize between [-1,1]
+        xs = [(x + 32768) / 65535 * 2 - 1 for x in xs]
+        ys = [(y + 32768) / 65535 * 2 - 1 for y in ys]
+
+        kx, ky = self.keystone
+        if kx or ky:
+            xs, ys = [a*x + b*y for x, y in zip(xs, ys)], [c*x + d*y for x, y in zip(xs, ys)]
+            xs, ys = [x * (1 + ky*y) + tx for x, y in zip(xs, ys)], [y * (1 + kx*x) + ty for x, y in zip(xs, ys)]
+        else:
+            xs, ys = [a*x + b*y + tx for x, y in zip(xs, ys)], [c*x + d*y + ty for x, y in zip(xs, ys)]
+
+        # clip to window
+        if self.clip:
+            xs = [min(max(x, -1), 1) for x in xs]
+            ys = [min(max(y, -1), 1) for y in ys]
+
+        return xs, ys, list(status)